@@ -4,9 +4,13 @@ import os
 import time
 from urllib.parse import quote
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 
+from http_transport import RecordingSession, ReplaySession
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -15,24 +19,127 @@ DEFAULT_CONFIG = {
     "BASE_URL": os.getenv("BASE_URL", "http://10.180.161.48/isharebackend"),
     "ADMIN_ID": os.getenv("ADMIN_ID", "service@amway.com"),
     "ADMIN_PW": os.getenv("ADMIN_PW", "system"),
+    # HTTP 傳輸模式：live (直連) / record (直連並錄製) / replay (以錄製資料離線回放)
+    "HTTP_TRANSPORT": os.getenv("HTTP_TRANSPORT", "live"),
+    "HTTP_FIXTURE": os.getenv("HTTP_FIXTURE", "ishare_fixture.jsonl"),
+    "REPLAY_LATENCY_SCALE": os.getenv("REPLAY_LATENCY_SCALE", "1.0"),
+    # 預先登入的 session 與 __RequestVerificationToken 可重複使用的秒數
+    "SESSION_MAX_AGE": os.getenv("SESSION_MAX_AGE", "300"),
+    # 送出前合併相鄰文字/表格 section 的內容上限 (字元數)，0 表示不合併
+    "SECTION_MAX_CHARS": os.getenv("SECTION_MAX_CHARS", "20000"),
+    # 將重複的微軟正黑體字型提升到外層 div (字型改為繼承，僅適用於沒有 p.MsoNormal 字型規則的前台)
+    "HOIST_FONT_STYLE": os.getenv("HOIST_FONT_STYLE", "false"),
 }
 
+def config_number(config, key, default, cast=float):
+    """讀取數值設定 (可能來自 .env 的字串)，格式錯誤時改用預設值並提示"""
+    raw = config.get(key, default)
+    try:
+        return cast(raw)
+    except (TypeError, ValueError):
+        print(f"⚠️ 設定值 {key}={raw!r} 格式錯誤，改用預設值 {default}")
+        return default
+
+
+def config_flag(config, key, default=False):
+    """讀取開關設定 (true/false、1/0、yes/no、on/off)，無法辨識時改用預設值並提示"""
+    raw = config.get(key, default)
+    if isinstance(raw, bool):
+        return raw
+    value = str(raw).strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off", ""):
+        return False
+    print(f"⚠️ 設定值 {key}={raw!r} 格式錯誤，改用預設值 {default}")
+    return default
+
+
+def create_session(config):
+    """依照 config 中的 HTTP_TRANSPORT 建立 Session (live / record / replay)"""
+    mode = (config.get("HTTP_TRANSPORT") or "live").lower()
+    fixture_path = config.get("HTTP_FIXTURE") or "ishare_fixture.jsonl"
+
+    if mode == "live":
+        return requests.Session()
+    if mode == "record":
+        return RecordingSession(fixture_path)
+    if mode == "replay":
+        if not os.path.exists(fixture_path):
+            raise FileNotFoundError(f"找不到 Replay fixture: {fixture_path}")
+        return ReplaySession(fixture_path, latency_scale=config_number(config, "REPLAY_LATENCY_SCALE", 1.0))
+    raise ValueError(f"未知的 HTTP_TRANSPORT 模式: {mode}")
+
+# 背景預先登入 (prefetch_session) 共用的執行緒池
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ishare-prefetch")
+
 class IShareUploader:
-    def __init__(self, config=None, dry_run=False):
+    def __init__(self, config=None, dry_run=False, session=None):
         self.config = config or DEFAULT_CONFIG
         self.dry_run = dry_run
-        self.session = requests.Session()
+        # 可注入自訂 Session (例如 RecordingSession / ReplaySession)，否則依 config 建立
+        self.session = session or create_session(self.config)
         self.token = "MOCK_TOKEN" if dry_run else ""
+        self._verified_at = 0.0
+        self._warmup = None
+        self._warmup_lock = threading.Lock()
         
         if self.dry_run:
             print("⚠️ 啟動 Dry Run 模式：不會真的連接伺服器或上傳檔案。")
 
+    def prefetch_session(self):
+        """在背景預先登入並取得 Token，讓點擊發布前的網路往返與文件解析、預覽重疊執行
+
+        已有進行中或仍有效的預先登入時不會重複發出請求，可在每次 Streamlit 重跑時呼叫。
+        """
+        if self.dry_run:
+            return None
+
+        with self._warmup_lock:
+            in_flight = self._warmup is not None and not self._warmup.done()
+            if in_flight or self._session_fresh():
+                return self._warmup
+            self._warmup = _PREFETCH_POOL.submit(self._warm_up)
+            return self._warmup
+
+    def _warm_up(self):
+        self._authenticate()
+        # 能取得 Token 頁即代表 session 已通過驗證
+        self.refresh_token()
+
+    def _session_fresh(self):
+        max_age = config_number(self.config, "SESSION_MAX_AGE", 300.0)
+        return bool(self.token) and time.monotonic() - self._verified_at < max_age
+
+    def _await_warmup(self):
+        """等待預先登入完成，回傳 session 是否已驗證且仍有效"""
+        future = self._warmup
+        if future is None:
+            return False
+        try:
+            future.result()
+        except Exception as e:
+            print(f"⚠️ 預先登入失敗，改為重新登入: {e}")
+            self._warmup = None
+            return False
+        return self._session_fresh()
+
     def login(self):
-        """執行身分驗證"""
+        """執行身分驗證 (若已有預先登入的有效 session 則直接沿用)"""
         if self.dry_run:
             print("[Mock] 模擬登入成功")
             return
-            
+
+        # 預先登入仍排在共用執行緒池中尚未開始時直接登入，不必等待其他使用者的預先登入
+        if self._warmup is not None and self._warmup.cancel():
+            self._warmup = None
+        elif self._await_warmup():
+            print("✅ 沿用預先登入的 session")
+            return
+
+        self._authenticate()
+
+    def _authenticate(self):
         print("[Auth] 正在執行管理者登入...")
         try:
             res = self.session.get(f"{self.config['BASE_URL']}/Admin.aspx")
@@ -61,7 +168,11 @@ class IShareUploader:
         url = f"{self.config['BASE_URL']}/Article/MonthlyPostSection/{self.config['MONTHLY_POST_ID']}"
         res = self.session.get(url)
         soup = BeautifulSoup(res.text, 'html.parser')
-        self.token = soup.find("input", {"name": "__RequestVerificationToken"})['value']
+        token_input = soup.find("input", {"name": "__RequestVerificationToken"})
+        if token_input is None:
+            raise RuntimeError("無法取得 __RequestVerificationToken，請確認登入是否成功")
+        self.token = token_input['value']
+        self._verified_at = time.monotonic()
 
     def upload_image_bytes(self, image_data, filename, content_type="image/jpeg"):
         """直接上傳二進位圖片數據 (記憶體內)"""
@@ -119,36 +230,57 @@ class IShareUploader:
         
         return "&".join(payload)
 
+    def build_submit_payload(self, data_items):
+        """submit_data 實際送出的表單欄位 (requests 會再以 form-urlencoded 編碼)"""
+        return {
+            "__RequestVerificationToken": self.token,
+            "isPost": "true",
+            "Id": self.config['MONTHLY_POST_ID'],
+            "data": data_items
+        }
+
     def submit_data(self, data_items):
-        """提交組合好的 data 陣列"""
+        """提交組合好的 data 陣列，回傳是否成功 (失敗時會重新取得 Token 重試一次)"""
         if self.dry_run:
             print("\n[Mock] 準備提交 Payload:")
             print(json.dumps(data_items, indent=2, ensure_ascii=False))
             print("✅ [Mock] 模擬提交成功")
-            return
+            return True
 
-        self.refresh_token()
-        
-        payload = {
-            "__RequestVerificationToken": self.token,
-            "isPost": "true",
-            "Id": self.config['MONTHLY_POST_ID'],
-            "data": data_items
-        }
+        # 預先取得的 Token 仍有效時直接使用，省下一次往返
+        if not self._session_fresh():
+            self.refresh_token()
 
         headers = {
             "X-Requested-With": "XMLHttpRequest",
             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
             "Connection": "keep-alive"
         }
-        # Reset headers to avoid accumulation
-        self.session.headers.clear()
-        self.session.headers.update(headers)
         api_url = f"{self.config['BASE_URL']}/Article/MonthlyPostSection/{self.config['MONTHLY_POST_ID']}"
-        # Disable redirects to prevent loops
-        response = self.session.post(api_url, data=payload, headers=headers, allow_redirects=False)
 
-        if '"code":200' in response.text:
-            print("✅ 批次組合上傳成功")
-        else:
+        for attempt in range(2):
+            payload = self.build_submit_payload(data_items)
+            # Headers 只套用在這次請求，避免 session 沿用時影響後續的 multipart 圖片上傳
+            # Disable redirects to prevent loops
+            response = self.session.post(api_url, data=payload, headers=headers, allow_redirects=False)
+
+            if '"code":200' in response.text:
+                print("✅ 批次組合上傳成功")
+                return True
+
             print(f"❌ 上傳失敗，伺服器回應: {response.text}")
+            if attempt == 0:
+                # 沿用的 session 或 Token 可能已過期：重新取得後再試一次
+                print("[Auth] 重新取得 Token 後重試...")
+                self._verified_at = 0.0
+                self._renew_session()
+
+        return False
+
+    def _renew_session(self):
+        """重新取得 Token；若 session 已失效 (取不到 Token) 則重新登入"""
+        try:
+            self.refresh_token()
+        except RuntimeError:
+            self._authenticate()
+            self.refresh_token()
@@ -0,0 +1,112 @@
+import json
+import re
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 回放時不應沿用的標頭 (內容已解碼，長度/編碼資訊會失真)
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+def route_key(method, url):
+    """將請求正規化為 (METHOD, path)，路徑中的數字 ID 以 {id} 取代，讓不同文章 ID 共用錄製資料"""
+    path = urlsplit(url).path
+    path = re.sub(r"/\d+(?=/|$)", "/{id}", path)
+    return method.upper(), path
+
+
+# 同一 process 內所有 RecordingSession 共用，避免多個 Streamlit session 同時錄製時交錯寫入
+_FIXTURE_LOCK = threading.Lock()
+
+
+def load_exchanges(fixture_path):
+    """讀取 JSON Lines 格式的 fixture (每行一筆往返)"""
+    exchanges = []
+    with open(fixture_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                exchanges.append(json.loads(line))
+    return exchanges
+
+
+class RecordingSession(requests.Session):
+    """連接真實伺服器，並將每次往返 (回應內容、狀態碼、耗時) 記錄到 fixture 檔案
+
+    Fixture 為 JSON Lines 格式，每次往返只附加一行，多次執行、Streamlit 重跑或
+    多個 session 同時錄製都會累積到同一份檔案。
+    """
+
+    def __init__(self, fixture_path):
+        super().__init__()
+        self.fixture_path = fixture_path
+
+    def request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        res = super().request(method, url, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        method_key, path = route_key(method, url)
+        # 僅記錄回應；請求內容 (含帳號密碼) 不寫入 fixture
+        exchange = {
+            "method": method_key,
+            "path": path,
+            "status_code": res.status_code,
+            "headers": {k: v for k, v in res.headers.items() if k.lower() not in _HOP_HEADERS},
+            "encoding": res.encoding,
+            "body": res.text,
+            "elapsed": round(elapsed, 4),
+        }
+        line = json.dumps(exchange, ensure_ascii=False) + "\n"
+        with _FIXTURE_LOCK:
+            with open(self.fixture_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return res
+
+
+class ReplaySession(requests.Session):
+    """以本地 fixture 回應所有請求，不連接網路
+
+    latency_scale 控制模擬延遲：1.0 為錄製時的實際耗時，0 為不延遲，
+    大於 1 可模擬較慢的伺服器。同一路由有多筆錄製時依序輪流回放。
+    """
+
+    def __init__(self, fixture_path, latency_scale=1.0):
+        super().__init__()
+        self.fixture_path = fixture_path
+        self.latency_scale = latency_scale
+        self.routes = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+        for exchange in load_exchanges(fixture_path):
+            key = (exchange["method"], exchange["path"])
+            self.routes.setdefault(key, []).append(exchange)
+
+    def request(self, method, url, *args, **kwargs):
+        key = route_key(method, url)
+        recorded = self.routes.get(key)
+        if not recorded:
+            raise requests.exceptions.ConnectionError(f"Replay fixture 中沒有 {key[0]} {key[1]} 的錄製資料")
+
+        with self._lock:
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+        exchange = recorded[index % len(recorded)]
+
+        delay = exchange.get("elapsed", 0) * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+        encoding = exchange.get("encoding") or "utf-8"
+        res = requests.Response()
+        res.status_code = exchange["status_code"]
+        res.headers = CaseInsensitiveDict(exchange.get("headers", {}))
+        res.encoding = encoding
+        res._content = exchange["body"].encode(encoding)
+        res.url = url
+        res.elapsed = timedelta(seconds=delay)
+        return res
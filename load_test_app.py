@@ -0,0 +1,529 @@
+"""
+Streamlit 前端多使用者壓力測試
+
+啟動一個真實的 `streamlit run word_uploader_app.py` 伺服器，再以無頭 (headless) websocket
+client 模擬 N 個同時操作的編輯者。每個 session 依序執行：
+首次載入 (render) → 上傳合成 Word 文件 (upload) → 重跑預覽 (preview) → 發布 (publish)，
+後端為本機啟動的 mock iShare 伺服器 (或以 --replay 使用 http_transport 錄製的 fixture)。
+
+client 直接使用 Streamlit 的 BackMsg/ForwardMsg 協定：上傳走與瀏覽器相同的
+file_urls_request + HTTP PUT 流程，按鈕點擊則以 trigger_value 觸發重跑。
+所有 session 共用同一個伺服器 process，延遲包含 GIL、CPU 與預先登入執行緒池的競爭；
+RSS 於測試期間持續讀取該伺服器 PID 的 /proc/<pid>/status (無 /proc 時改用 psutil)。
+
+每次發布都會檢查成功訊息中的段落數與圖片數是否與預覽一致；mock 後端會拒絕
+缺少 multipart boundary 的圖片上傳、未登入的請求與 Token 不符的送出。
+
+測試用伺服器只監聽 127.0.0.1，並關閉 XSRF 保護以便 client 不需瀏覽器 cookie。
+
+用法:
+    python load_test_app.py --sessions 8 --rounds 3 --paragraphs 200 --images 10 --tables 5
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urljoin
+
+import requests
+
+from mock_ishare import make_png, start_mock_backend
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "word_uploader_app.py")
+STEPS = ["render", "upload", "preview", "publish"]
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+# --- 合成 Word 文件 ---
+def make_docx(paragraphs, images, tables):
+    """產生包含標題、列表、粗體、表格與圖片的 .docx (bytes)"""
+    from docx import Document
+    from docx.shared import Inches, Pt, RGBColor
+
+    doc = Document()
+    png = make_png()
+    image_every = max(1, paragraphs // (images + 1)) if images else 0
+    table_every = max(1, paragraphs // (tables + 1)) if tables else 0
+    images_left, tables_left = images, tables
+
+    for i in range(paragraphs):
+        kind = i % 4
+        if kind == 0:
+            doc.add_heading(f"第 {i} 段標題", level=2)
+        elif kind == 1:
+            doc.add_paragraph(f"• 列點項目 {i}，用於測試列表格式")
+        elif kind == 2:
+            run = doc.add_paragraph().add_run(f"粗體彩色段落 {i}：iShare 上稿壓力測試內容。")
+            run.bold = True
+            run.font.color.rgb = RGBColor(0xC0, 0x00, 0x00)
+            run.font.size = Pt(12)
+        else:
+            doc.add_paragraph(f"一般段落 {i}：" + "這是一段合成的測試文字。" * 5)
+
+        if images_left and image_every and (i + 1) % image_every == 0:
+            doc.add_picture(io.BytesIO(png), width=Inches(1))
+            images_left -= 1
+        if tables_left and table_every and (i + 1) % table_every == 0:
+            table = doc.add_table(rows=3, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"R{r}C{c}"
+            tables_left -= 1
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+# --- Streamlit 伺服器 ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_streamlit_server(startup_timeout=60):
+    """啟動 word_uploader_app.py，等待 /_stcore/health 就緒後回傳 (process, base_url, log)"""
+    port = free_port()
+    log = tempfile.TemporaryFile()
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", APP_PATH,
+        "--server.headless=true",
+        "--server.address=127.0.0.1",
+        f"--server.port={port}",
+        "--server.enableXsrfProtection=false",
+        "--server.fileWatcherType=none",
+        "--browser.gatherUsageStats=false",
+        "--global.developmentMode=false",
+    ]
+    process = subprocess.Popen(cmd, cwd=APP_DIR, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            if requests.get(f"{base_url}/_stcore/health", timeout=1).ok:
+                return process, base_url, log
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+
+    stop_streamlit_server(process)
+    log.seek(0)
+    output = log.read().decode("utf-8", errors="replace")[-2000:]
+    raise RuntimeError(f"Streamlit 伺服器未能啟動：\n{output}")
+
+
+def stop_streamlit_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def read_rss_mb(pid):
+    """讀取指定 process 目前的 RSS (MB)；無法取得時回傳 None"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class RssSampler(threading.Thread):
+    """在背景定期取樣伺服器 process 的 RSS"""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# --- Headless client ---
+class HeadlessSession:
+    """以 websocket 直接驅動 Streamlit 伺服器的單一瀏覽器分頁 (不需瀏覽器)"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_id = None
+        self.elements = []
+        self.widget_states = {}
+        self._ws = None
+        self._reader = None
+        self._finished = None
+        self._file_urls = None
+
+    async def __aenter__(self):
+        import websockets
+
+        ws_url = self.base_url.replace("http://", "ws://", 1) + "/_stcore/stream"
+        self._ws = await websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None)
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._reader.cancel()
+        await self._ws.close()
+
+    async def _read(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        async for raw in self._ws:
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                # 每次重跑開始時伺服器都會送出 new_session，元素清單隨之重建
+                self.session_id = msg.new_session.initialize.session_id
+                self.elements = []
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                self.elements.append((element_type, getattr(element, element_type)))
+            elif kind == "script_finished":
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN and self._finished and not self._finished.done():
+                    self._finished.set_result(msg.script_finished)
+            elif kind == "file_urls_response":
+                if self._file_urls and not self._file_urls.done():
+                    self._file_urls.set_result(msg.file_urls_response)
+
+        # 連線中斷時讓等待中的步驟立即失敗，而不是等到逾時
+        for future in (self._finished, self._file_urls):
+            if future and not future.done():
+                future.set_exception(ConnectionError("Streamlit websocket 連線已中斷"))
+
+    async def rerun(self, trigger_id=None):
+        """送出 rerun_script 並等待 script_finished，回傳耗時 (秒)"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back = BackMsg()
+        client_state = back.rerun_script
+        client_state.query_string = ""
+        for state in self.widget_states.values():
+            client_state.widget_states.widgets.append(state)
+        if trigger_id is not None:
+            trigger = client_state.widget_states.widgets.add()
+            trigger.id = trigger_id
+            trigger.trigger_value = True
+
+        self._finished = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await self._ws.send(back.SerializeToString())
+        status = await asyncio.wait_for(self._finished, self.timeout)
+        elapsed = time.perf_counter() - start
+        if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+            raise RuntimeError("script 編譯失敗")
+        return elapsed
+
+    async def upload_file(self, widget_id, name, data, content_type):
+        """與瀏覽器相同的上傳流程：取得上傳 URL → PUT 檔案 → 記錄 file_uploader 的 widget state"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        back = BackMsg()
+        back.file_urls_request.request_id = uuid.uuid4().hex
+        back.file_urls_request.file_names.append(name)
+        back.file_urls_request.session_id = self.session_id
+
+        self._file_urls = asyncio.get_running_loop().create_future()
+        await self._ws.send(back.SerializeToString())
+        response = await asyncio.wait_for(self._file_urls, self.timeout)
+        file_urls = response.file_urls[0]
+
+        upload_url = urljoin(self.base_url + "/", file_urls.upload_url)
+        res = await asyncio.to_thread(
+            requests.put, upload_url, files={"file": (name, data, content_type)}, timeout=self.timeout
+        )
+        res.raise_for_status()
+
+        state = WidgetState(id=widget_id)
+        info = state.file_uploader_state_value.uploaded_file_info.add()
+        info.name = name
+        info.size = len(data)
+        info.file_id = file_urls.file_id
+        info.file_urls.CopyFrom(file_urls)
+        self.widget_states[widget_id] = state
+
+    def clear_file(self, widget_id):
+        """模擬移除已上傳的檔案 (下一次重跑時生效)"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = WidgetState(id=widget_id)
+        state.file_uploader_state_value.SetInParent()
+        self.widget_states[widget_id] = state
+
+    def find(self, element_type, label=None):
+        for kind, element in self.elements:
+            if kind == element_type and (label is None or label in element.label):
+                return element
+        return None
+
+    def markdowns(self, element_type=None):
+        return [
+            element.body for kind, element in self.elements
+            if kind == "markdown" and (element_type is None or element.element_type == element_type)
+        ]
+
+    def alerts(self, alert_format):
+        return [element.body for kind, element in self.elements if kind == "alert" and element.format == alert_format]
+
+    def failures(self):
+        """畫面上的例外與錯誤訊息"""
+        from streamlit.proto.Alert_pb2 import Alert
+
+        failures = [element.message for kind, element in self.elements if kind == "exception"]
+        return failures + self.alerts(Alert.ERROR)
+
+
+def check_publish(session):
+    """比對發布結果與預覽：成功訊息中的段落數與圖片數必須一致，回傳錯誤訊息或 None"""
+    from streamlit.proto.Alert_pb2 import Alert
+    from streamlit.proto.Markdown_pb2 import Markdown
+
+    expected_sections = None
+    for body in session.markdowns():
+        match = re.search(r"共 (\d+) 個段落", body)
+        if match:
+            expected_sections = int(match.group(1))
+    expected_images = sum(1 for body in session.markdowns(Markdown.CAPTION) if body == "圖片")
+
+    for body in session.alerts(Alert.SUCCESS):
+        match = re.search(r"成功上傳 (\d+) 個段落 \(含 (\d+) 張圖片\)", body)
+        if match:
+            sections, images = int(match.group(1)), int(match.group(2))
+            if (sections, images) != (expected_sections, expected_images):
+                return (
+                    f"publish: 上傳 {sections} 個段落 / {images} 張圖片，"
+                    f"預期 {expected_sections} 個段落 / {expected_images} 張圖片"
+                )
+            return None
+    return "publish: 沒有出現發布成功訊息"
+
+
+async def run_session(session_index, base_url, docx_bytes, rounds, timeout):
+    """執行單一 session，回傳各步驟耗時與錯誤"""
+    timings = {step: [] for step in STEPS}
+    errors = []
+
+    def record(step, session, elapsed):
+        timings[step].append(elapsed)
+        errors.extend(f"{step}: {failure}" for failure in session.failures())
+
+    try:
+        async with HeadlessSession(base_url, timeout) as session:
+            record("render", session, await session.rerun())
+            uploader = session.find("file_uploader")
+            if uploader is None:
+                errors.append("render: 找不到檔案上傳元件")
+                rounds = 0
+
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await session.upload_file(uploader.id, "synthetic.docx", docx_bytes, DOCX_TYPE)
+                await session.rerun()
+                record("upload", session, time.perf_counter() - start)
+                record("preview", session, await session.rerun())
+
+                publish = session.find("button", "確認發布")
+                if publish is None:
+                    errors.append("publish: 找不到發布按鈕")
+                else:
+                    record("publish", session, await session.rerun(trigger_id=publish.id))
+                    failure = check_publish(session)
+                    if failure:
+                        errors.append(failure)
+
+                # 清除文件，讓下一輪重新經歷上傳流程
+                session.clear_file(uploader.id)
+                await session.rerun()
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+
+    return {"session": session_index, "timings": timings, "errors": errors}
+
+
+async def run_sessions(base_url, docx_bytes, sessions, rounds, timeout):
+    return await asyncio.gather(
+        *(run_session(i, base_url, docx_bytes, rounds, timeout) for i in range(sessions))
+    )
+
+
+# --- 報表 ---
+def percentile(values, pct):
+    """Nearest-rank 百分位數"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def step_stats(values, percentiles):
+    return {
+        "count": len(values),
+        **{f"p{p}_ms": round(percentile(values, p) * 1000, 1) if values else None for p in percentiles},
+        "max_ms": round(max(values) * 1000, 1) if values else None,
+    }
+
+
+def summarize(results, wall_time, server_pid, idle_rss, rss_samples, final_rss):
+    report = {"sessions": len(results), "wall_time_s": round(wall_time, 3), "steps": {}, "per_session": {},
+              "server_rss_mb": None, "errors": []}
+
+    for step in STEPS:
+        values = [t for r in results for t in r["timings"][step]]
+        report["steps"][step] = step_stats(values, (50, 90, 95, 99))
+
+    for r in results:
+        report["per_session"][r["session"]] = {step: step_stats(r["timings"][step], (50, 95)) for step in STEPS}
+
+    if idle_rss is not None and rss_samples:
+        peak = max(rss_samples)
+        report["server_rss_mb"] = {
+            "pid": server_pid,
+            "idle": round(idle_rss, 1),
+            "peak": round(peak, 1),
+            "final": round(final_rss, 1) if final_rss is not None else None,
+            "peak_over_idle": round(peak - idle_rss, 1),
+            "per_session_over_idle": round((peak - idle_rss) / max(1, len(results)), 1),
+            "samples": len(rss_samples),
+        }
+
+    for r in results:
+        report["errors"].extend(f"session {r['session']} {e}" for e in r["errors"])
+    return report
+
+
+def print_report(report):
+    def cell(value):
+        return f"{'-' if value is None else value:>10}"
+
+    print(f"\n=== Streamlit 壓力測試：{report['sessions']} sessions，總耗時 {report['wall_time_s']}s ===")
+    print(f"{'step':<10}{'count':>7}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for step, stats in report["steps"].items():
+        cols = [stats[k] for k in ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{step:<10}{stats['count']:>7}" + "".join(cell(c) for c in cols))
+
+    print("\n各 session 明細 (ms)")
+    print(f"{'session':<9}{'step':<10}{'count':>7}{'p50':>10}{'p95':>10}{'max':>10}")
+    for session, steps in report["per_session"].items():
+        for step, stats in steps.items():
+            cols = [stats[k] for k in ("p50_ms", "p95_ms", "max_ms")]
+            print(f"{session:<9}{step:<10}{stats['count']:>7}" + "".join(cell(c) for c in cols))
+
+    rss = report["server_rss_mb"]
+    if rss:
+        print(
+            f"\n伺服器 RSS (MB，PID {rss['pid']}，{rss['samples']} 次取樣): 閒置 {rss['idle']}，"
+            f"峰值 {rss['peak']}，結束 {rss['final']}，"
+            f"峰值增量 {rss['peak_over_idle']} (平均每 session {rss['per_session_over_idle']})"
+        )
+    else:
+        print("\n伺服器 RSS: 無法讀取 /proc 且未安裝 psutil，略過")
+
+    if report["errors"]:
+        print(f"\n❌ 共 {len(report['errors'])} 個錯誤：")
+        for err in report["errors"][:20]:
+            print(f"  - {err}")
+    else:
+        print("\n✅ 所有 session 均無錯誤")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="iShare Word Uploader Streamlit 多使用者壓力測試")
+    parser.add_argument("--sessions", type=int, default=4, help="同時模擬的 session 數")
+    parser.add_argument("--rounds", type=int, default=1, help="每個 session 重複 上傳/預覽/發布 的次數")
+    parser.add_argument("--paragraphs", type=int, default=100, help="合成文件的段落數")
+    parser.add_argument("--images", type=int, default=5, help="合成文件的圖片數")
+    parser.add_argument("--tables", type=int, default=3, help="合成文件的表格數")
+    parser.add_argument("--backend-latency", type=float, default=0.05, help="mock 後端每個請求的延遲 (秒)")
+    parser.add_argument("--replay", metavar="FIXTURE", help="改用 http_transport 錄製的 fixture 作為後端")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="--replay 時的延遲倍率")
+    parser.add_argument("--timeout", type=float, default=120, help="每次 script rerun 的逾時秒數")
+    parser.add_argument("--json", metavar="PATH", help="將報表另存為 JSON")
+    args = parser.parse_args()
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        print("❌ 需要 websockets 套件 (pip install websockets)")
+        return 1
+
+    # 環境變數需在伺服器啟動前設定 (load_dotenv 不會覆寫既有值)
+    backend = None
+    if args.replay:
+        os.environ["HTTP_TRANSPORT"] = "replay"
+        os.environ["HTTP_FIXTURE"] = os.path.abspath(args.replay)
+        os.environ["REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+    else:
+        backend, backend_url = start_mock_backend(args.backend_latency)
+        os.environ["BASE_URL"] = backend_url
+        os.environ["HTTP_TRANSPORT"] = "live"
+
+    docx_bytes = make_docx(args.paragraphs, args.images, args.tables)
+    print(f"合成文件：{args.paragraphs} 段落 / {args.images} 圖片 / {args.tables} 表格，{len(docx_bytes) / 1024:.1f} KB")
+
+    process, base_url, log = start_streamlit_server()
+    print(f"Streamlit 伺服器已啟動：{base_url} (PID {process.pid})")
+    try:
+        idle_rss = read_rss_mb(process.pid)
+        sampler = RssSampler(process.pid)
+        sampler.start()
+
+        start = time.perf_counter()
+        results = asyncio.run(run_sessions(base_url, docx_bytes, args.sessions, args.rounds, args.timeout))
+        wall_time = time.perf_counter() - start
+
+        sampler.stop()
+        final_rss = read_rss_mb(process.pid)
+    finally:
+        stop_streamlit_server(process)
+        log.close()
+        if backend:
+            backend.shutdown()
+
+    report = summarize(results, wall_time, process.pid, idle_rss, sampler.samples, final_rss)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+本機 mock iShare 後端與合成測試資料，供單元測試與 load_test_app.py 共用
+"""
+import json
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+BACKEND_PREFIX = "/isharebackend"
+
+LOGIN_PAGE = """<html><body><form method="post" action="Admin.aspx">
+<input type="hidden" name="__VIEWSTATE" value="MOCK_VIEWSTATE" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" value="MOCK_GENERATOR" />
+<input type="hidden" name="__EVENTVALIDATION" value="MOCK_VALIDATION" />
+</form></body></html>"""
+
+SECTION_PAGE = """<html><body><form>
+<input name="__RequestVerificationToken" type="hidden" value="{token}" />
+</form></body></html>"""
+
+SESSION_COOKIE = "ASP.NET_SessionId=mock-session"
+
+
+class MockBackendHandler(BaseHTTPRequestHandler):
+    """模擬 iShare 後端的登入、Token 頁、PhotoUpload 與 submit 端點
+
+    與真實後端一樣會拒絕格式錯誤的請求，並將每個請求記錄在 requests_log。
+    """
+    latency = 0.0
+    token = "MOCK_VERIFICATION_TOKEN"
+    requests_log = []
+
+    def _reply(self, body, content_type="text/html; charset=utf-8", status=200, cookie=None):
+        if self.latency:
+            time.sleep(self.latency)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if cookie:
+            self.send_header("Set-Cookie", f"{cookie}; Path=/")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _logged_in(self):
+        return SESSION_COOKIE in (self.headers.get("Cookie") or "")
+
+    def _log(self, method, path):
+        self.requests_log.append({
+            "method": method,
+            "path": path,
+            "content_type": self.headers.get("Content-Type", ""),
+        })
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self._log("GET", path)
+        if path.endswith("/Admin.aspx"):
+            self._reply(LOGIN_PAGE)
+        elif "/Article/MonthlyPostSection/" in path:
+            # 未登入時與 ASP.NET 一樣回到登入頁 (沒有 Token)
+            self._reply(SECTION_PAGE.format(token=self.token) if self._logged_in() else LOGIN_PAGE)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0]
+        self._log("POST", path)
+        content_type = self.headers.get("Content-Type", "")
+
+        if path.endswith("/Admin.aspx"):
+            form = parse_qs(body.decode("utf-8"))
+            required = ("__VIEWSTATE", "__EVENTVALIDATION", "AdminID", "AdminPassword")
+            if all(form.get(key) for key in required):
+                self._reply("<html><body>OK</body></html>", cookie=SESSION_COOKIE)
+            else:
+                self._reply("missing login fields", "text/plain", status=400)
+        elif not self._logged_in():
+            self._reply("not logged in", "text/plain", status=401)
+        elif path.endswith("/Page/PhotoUpload"):
+            if not content_type.startswith("multipart/form-data") or "boundary=" not in content_type:
+                self._reply(f"unsupported Content-Type: {content_type}", "text/plain", status=415)
+            else:
+                self._reply(json.dumps({"url": f"http://mock-server/uploads/{time.time_ns()}.jpg"}), "application/json")
+        elif "/Article/MonthlyPostSection/" in path:
+            form = parse_qs(body.decode("utf-8"))
+            if form.get("__RequestVerificationToken") != [self.token]:
+                self._reply(json.dumps({"code": 400, "message": "invalid token"}), "application/json", status=400)
+            else:
+                self._reply(json.dumps({"code": 200}, separators=(",", ":")), "application/json")
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_backend(latency):
+    """在背景執行緒啟動 mock 後端，回傳 (server, BASE_URL)"""
+    MockBackendHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockBackendHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}{BACKEND_PREFIX}"
+
+
+def make_png(width=64, height=48):
+    """產生單色 PNG (不依賴 Pillow)"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + b"\x3b\x82\xf6" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
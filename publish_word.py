@@ -1,15 +1,21 @@
 import re
 from docx import Document
 from docx.oxml.ns import qn
-from urllib.parse import quote
-from backend_api import IShareUploader, DEFAULT_CONFIG
+from urllib.parse import quote, urlencode
+from backend_api import IShareUploader, DEFAULT_CONFIG, config_flag, config_number
+
+# process_docx 在每個段落 span 上重複的字型樣式，優化時提升到外層 div
+FONT_STYLE = 'font-family:&quot;微軟正黑體&quot;,sans-serif'
+_FONT_ONLY_SPAN = re.compile(r'<span style="' + re.escape(FONT_STYLE) + r';?">([^<]*)</span>')
+_FONT_DECL = re.compile(r'(?<=style=")' + re.escape(FONT_STYLE) + r';?')
+_PARAGRAPH = re.compile(r'<p\b.*?</p>', re.S)
 
 class WordUploader(IShareUploader):
-    def __init__(self, monthly_post_id, config=None):
+    def __init__(self, monthly_post_id, config=None, session=None):
         # 合併 Config
         final_config = config or DEFAULT_CONFIG.copy()
         final_config['MONTHLY_POST_ID'] = str(monthly_post_id)
-        super().__init__(config=final_config)
+        super().__init__(config=final_config, session=session)
     
     def extract_table_html(self, table):
         """
@@ -265,9 +271,117 @@ class WordUploader(IShareUploader):
         
         return sections
 
+    def _split_blocks(self, content):
+        """將 text section 拆成區塊 (表格整塊、段落逐一)，無法安全拆分時回傳整段"""
+        if content.startswith('<table'):
+            return [content]
+        blocks = _PARAGRAPH.findall(content)
+        if '\n'.join(blocks) != content:
+            return [content]
+        return blocks
+
+    def _hoist_font_style(self, blocks):
+        """將連續帶有字型樣式的區塊包進單一 div，移除各 span 上重複的 font-family
+
+        字型會從 inline style 變成繼承，頁面若有 p.MsoNormal 等字型規則就會蓋過，
+        因此只在確定前台沒有這類規則時才啟用 (HOIST_FONT_STYLE)。
+        沒有字型 span 的一般段落原本沿用頁面字型，不能被包進 div，因此會中斷區塊串。
+        """
+        html_parts = []
+        run = []
+
+        def flush():
+            if sum(block.count(FONT_STYLE) for block in run) > 1:
+                inner = '\n'.join(_FONT_DECL.sub('', _FONT_ONLY_SPAN.sub(r'\1', block)) for block in run)
+                inner = inner.replace(' style=""', '')
+                html_parts.append(f'<div style="{FONT_STYLE}">\n{inner}\n</div>')
+            else:
+                html_parts.extend(run)
+            run.clear()
+
+        for block in blocks:
+            if block.startswith('<table') or FONT_STYLE in block or block == '<p class="MsoNormal"><br></p>':
+                run.append(block)
+            else:
+                flush()
+                html_parts.append(block)
+        flush()
+        return '\n'.join(html_parts)
+
+    def _payload_bytes(self, sections):
+        """計算 sections 送出時的請求 body 大小 (圖片以空白網址計算)
+
+        與 submit_data 相同，data 內的每個 payload 會再被 form-urlencoded 一次。
+        """
+        data_items = []
+        for section in sections:
+            if section['type'] == 'image':
+                data_items.append(self.build_section_payload(1, "", "", photo_url="", alt="Word Image"))
+            else:
+                data_items.append(self.build_section_payload(8, "", section['content']))
+        return len(urlencode(self.build_submit_payload(data_items), doseq=True))
+
+    def optimize_sections(self, sections, max_chars=None, hoist_styles=None):
+        """
+        送出前的 payload 優化：合併相鄰的文字/表格 section，並可選擇提升重複的字型樣式
+
+        Args:
+            sections: process_docx 的輸出
+            max_chars: 合併後單一 section 的內容上限 (字元數)，預設取 config 的 SECTION_MAX_CHARS，0 表示不合併
+            hoist_styles: 是否將重複的字型樣式提升到外層 div，預設取 config 的 HOIST_FONT_STYLE (預設關閉)
+
+        Returns:
+            tuple: (優化後的 sections, 統計資訊 dict)
+        """
+        if max_chars is None:
+            max_chars = config_number(self.config, 'SECTION_MAX_CHARS', 20000, cast=int)
+        if hoist_styles is None:
+            hoist_styles = config_flag(self.config, 'HOIST_FONT_STYLE')
+
+        # 依大小上限將相鄰的 text section 分組 (含合併時的換行)，圖片維持原本位置作為分界
+        groups = []
+        for section in sections:
+            if section['type'] != 'text':
+                groups.append(section)
+                continue
+            last = groups[-1] if groups else None
+            if (
+                isinstance(last, list)
+                and max_chars
+                and sum(len(s['content']) for s in last) + len(last) + len(section['content']) <= max_chars
+            ):
+                last.append(section)
+            else:
+                groups.append([section])
+
+        optimized = []
+        for group in groups:
+            if not isinstance(group, list):
+                optimized.append(group)
+                continue
+            if hoist_styles:
+                blocks = [block for section in group for block in self._split_blocks(section['content'])]
+                content = self._hoist_font_style(blocks)
+            else:
+                content = '\n'.join(section['content'] for section in group)
+            optimized.append({'type': 'text', 'content': content})
+
+        stats = {
+            'sections_before': len(sections),
+            'sections_after': len(optimized),
+            'bytes_before': self._payload_bytes(sections),
+            'bytes_after': self._payload_bytes(optimized),
+        }
+        print(
+            f"[Optimize] 段落 {stats['sections_before']} → {stats['sections_after']}，"
+            f"Payload {stats['bytes_before']:,} → {stats['bytes_after']:,} bytes"
+        )
+        return optimized, stats
+
     def upload_sections(self, sections):
         """上傳解析後的 sections 到 iShare"""
         final_post_data = []
+        image_count = 0
         
         for section in sections:
             if section['type'] == 'image':
@@ -276,14 +390,16 @@ class WordUploader(IShareUploader):
                 if img_url:
                     payload = self.build_section_payload(1, "", "", photo_url=img_url, alt="Word Image")
                     final_post_data.append(payload)
+                    image_count += 1
             else:
                 # 文字
                 payload = self.build_section_payload(8, "", section['content'])
                 final_post_data.append(payload)
         
         if final_post_data:
-            self.submit_data(final_post_data)
-            return True, f"成功上傳 {len(final_post_data)} 個段落"
+            if not self.submit_data(final_post_data):
+                return False, "送出失敗，伺服器未接受此次發布"
+            return True, f"成功上傳 {len(final_post_data)} 個段落 (含 {image_count} 張圖片)"
         else:
             return False, "沒有可上傳的資料"
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 專案為平鋪模組結構，讓測試可直接 import 根目錄下的模組
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend_api import config_flag, config_number
+from mock_ishare import MockBackendHandler, make_png, start_mock_backend
+from publish_word import WordUploader
+
+SECTIONS = [
+    {'type': 'text', 'content': '<p class="MsoNormal">前言</p>'},
+    {'type': 'image', 'content': make_png()},
+]
+
+
+@pytest.fixture
+def uploader(monkeypatch):
+    monkeypatch.setattr(MockBackendHandler, "requests_log", [])
+    monkeypatch.setattr(MockBackendHandler, "token", "MOCK_VERIFICATION_TOKEN")
+    server, base_url = start_mock_backend(0)
+    config = {
+        "BASE_URL": base_url,
+        "ADMIN_ID": "admin",
+        "ADMIN_PW": "secret",
+        "HTTP_TRANSPORT": "live",
+    }
+    yield WordUploader(42325, config=config)
+    server.shutdown()
+
+
+def publish(uploader):
+    uploader.prefetch_session()
+    uploader.login()
+    return uploader.upload_sections(SECTIONS)
+
+
+def requests_to(suffix, method="POST"):
+    return [r for r in MockBackendHandler.requests_log if r["method"] == method and r["path"].endswith(suffix)]
+
+
+def test_publish_twice_on_one_uploader(uploader):
+    for _ in range(2):
+        assert publish(uploader) == (True, "成功上傳 2 個段落 (含 1 張圖片)")
+
+    uploads = requests_to("/Page/PhotoUpload")
+    assert len(uploads) == 2
+    assert all(r["content_type"].startswith("multipart/form-data; boundary=") for r in uploads)
+    # 預先登入的 session 會被沿用，不會重複登入
+    assert len(requests_to("/Admin.aspx")) == 1
+
+
+def test_submit_retries_once_with_fresh_token(uploader):
+    assert publish(uploader)[0]
+
+    # 伺服器端的 Token 已失效，沿用的 Token 會被拒絕
+    MockBackendHandler.token = "ROTATED_TOKEN"
+    assert publish(uploader)[0]
+    assert uploader.token == "ROTATED_TOKEN"
+    assert len(requests_to("/Article/MonthlyPostSection/42325")) == 3
+
+
+def test_submit_failure_is_reported(uploader, monkeypatch):
+    uploader.login()
+    monkeypatch.setattr(uploader, "_renew_session", lambda: None)
+    uploader.refresh_token()
+    MockBackendHandler.token = "ROTATED_TOKEN"
+
+    success, msg = uploader.upload_sections(SECTIONS)
+    assert not success
+    assert "送出失敗" in msg
+
+
+def test_config_number_falls_back_on_malformed_value(capsys):
+    assert config_number({"SESSION_MAX_AGE": "abc"}, "SESSION_MAX_AGE", 300.0) == 300.0
+    assert "SESSION_MAX_AGE" in capsys.readouterr().out
+    assert config_number({"SECTION_MAX_CHARS": "500"}, "SECTION_MAX_CHARS", 20000, cast=int) == 500
+    assert config_number({}, "REPLAY_LATENCY_SCALE", 1.0) == 1.0
+
+
+def test_login_does_not_wait_for_queued_warmup(uploader, monkeypatch):
+    import backend_api
+
+    # 單一 worker 被其他使用者的預先登入佔住，這個 uploader 的預先登入只能排隊
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait)
+    monkeypatch.setattr(backend_api, "_PREFETCH_POOL", pool)
+
+    warmup = uploader.prefetch_session()
+    uploader.login()
+
+    assert warmup.cancelled()
+    assert len(requests_to("/Admin.aspx")) == 1
+    assert uploader.upload_sections(SECTIONS)[0]
+
+    release.set()
+    pool.shutdown()
+
+
+def test_config_flag_parses_switches(capsys):
+    assert config_flag({"HOIST_FONT_STYLE": "True"}, "HOIST_FONT_STYLE") is True
+    assert config_flag({"HOIST_FONT_STYLE": "0"}, "HOIST_FONT_STYLE") is False
+    assert config_flag({}, "HOIST_FONT_STYLE") is False
+    assert config_flag({"HOIST_FONT_STYLE": "maybe"}, "HOIST_FONT_STYLE") is False
+    assert "HOIST_FONT_STYLE" in capsys.readouterr().out
@@ -0,0 +1,49 @@
+import pytest
+import requests
+
+from http_transport import RecordingSession, ReplaySession, load_exchanges, route_key
+from mock_ishare import start_mock_backend
+
+
+@pytest.fixture
+def backend():
+    server, base_url = start_mock_backend(0)
+    yield base_url
+    server.shutdown()
+
+
+def test_route_key_normalizes_post_id():
+    assert route_key("get", "http://h/isharebackend/Article/MonthlyPostSection/42325?x=1") == (
+        "GET",
+        "/isharebackend/Article/MonthlyPostSection/{id}",
+    )
+
+
+def test_concurrent_recorders_append_to_same_fixture(backend, tmp_path):
+    fixture = tmp_path / "fixture.jsonl"
+    first = RecordingSession(str(fixture))
+    second = RecordingSession(str(fixture))
+
+    first.get(f"{backend}/Admin.aspx")
+    second.get(f"{backend}/Article/MonthlyPostSection/1")
+    first.get(f"{backend}/Article/MonthlyPostSection/2")
+
+    exchanges = load_exchanges(str(fixture))
+    assert [e["path"] for e in exchanges] == [
+        "/isharebackend/Admin.aspx",
+        "/isharebackend/Article/MonthlyPostSection/{id}",
+        "/isharebackend/Article/MonthlyPostSection/{id}",
+    ]
+
+
+def test_replay_serves_recorded_responses(backend, tmp_path):
+    fixture = tmp_path / "fixture.jsonl"
+    RecordingSession(str(fixture)).get(f"{backend}/Admin.aspx")
+
+    replay = ReplaySession(str(fixture), latency_scale=0)
+    res = replay.get("http://elsewhere/isharebackend/Admin.aspx")
+    assert res.status_code == 200
+    assert "__VIEWSTATE" in res.text
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replay.get("http://elsewhere/isharebackend/Unknown")
@@ -0,0 +1,91 @@
+import requests
+from docx import Document
+
+from publish_word import FONT_STYLE, WordUploader
+
+LIST_ITEM = (
+    '<p class="MsoListParagraphCxSpFirst" style="margin-left:24.0pt"><span style="' + FONT_STYLE + ';">'
+    '<span style="font-family:Wingdings">l</span>項目</span></p>'
+)
+HEADING = '<p class="MsoNormal"><b><span style="' + FONT_STYLE + ';color:#0070C0;">標題</span></b></p>'
+PLAIN = '<p class="MsoNormal">一般段落</p>'
+
+
+def make_uploader(**config):
+    return WordUploader(1, config={"HTTP_TRANSPORT": "live", **config})
+
+
+def text(content):
+    return {'type': 'text', 'content': content}
+
+
+def test_merges_adjacent_text_up_to_limit():
+    sections = [text('a' * 10), text('b' * 10), text('c' * 10)]
+
+    # 合併時的換行也計入上限
+    optimized, _ = make_uploader().optimize_sections(sections, max_chars=20)
+    assert optimized == sections
+
+    optimized, stats = make_uploader().optimize_sections(sections, max_chars=21)
+    assert optimized == [text('a' * 10 + '\n' + 'b' * 10), text('c' * 10)]
+    assert (stats['sections_before'], stats['sections_after']) == (3, 2)
+    assert stats['bytes_after'] < stats['bytes_before']
+
+
+def test_payload_bytes_match_submitted_body():
+    uploader = make_uploader()
+    uploader.token = "TOKEN"
+    sections = [text(HEADING), {'type': 'image', 'content': b'\x89PNG'}]
+    data_items = [
+        uploader.build_section_payload(8, "", HEADING),
+        uploader.build_section_payload(1, "", "", photo_url="", alt="Word Image"),
+    ]
+
+    # 與 requests 送出 submit_data 表單時的 body 相同
+    body = requests.Request("POST", "http://h/", data=uploader.build_submit_payload(data_items)).prepare().body
+    _, stats = uploader.optimize_sections(sections)
+    assert stats['bytes_before'] == len(body)
+
+
+def test_images_stay_as_boundaries():
+    image = {'type': 'image', 'content': b'\x89PNG'}
+    sections = [text('a'), image, text('b'), text('c')]
+    optimized, _ = make_uploader().optimize_sections(sections, max_chars=1000)
+
+    assert optimized == [text('a'), image, text('b\nc')]
+
+
+def test_zero_limit_without_hoisting_is_a_no_op():
+    sections = [text(HEADING), text(LIST_ITEM)]
+    optimized, stats = make_uploader(SECTION_MAX_CHARS="0").optimize_sections(sections)
+
+    assert optimized == sections
+    assert stats['bytes_before'] == stats['bytes_after']
+
+
+def test_hoisting_is_opt_in():
+    sections = [text(HEADING + '\n' + LIST_ITEM)]
+    optimized, _ = make_uploader().optimize_sections(sections)
+    assert optimized == sections
+
+    optimized, _ = make_uploader(HOIST_FONT_STYLE="true").optimize_sections(sections)
+    assert FONT_STYLE not in optimized[0]['content'].split('\n', 1)[1]
+
+
+def test_hoists_list_and_table_blocks_but_not_plain_paragraphs():
+    uploader = make_uploader()
+    table = Document().add_table(rows=1, cols=1)
+    table.rows[0].cells[0].text = 'R0C0'
+    table_html = uploader.extract_table_html(table)
+
+    sections = [text(HEADING + '\n' + LIST_ITEM), text(table_html), text(PLAIN)]
+    optimized, _ = uploader.optimize_sections(sections, hoist_styles=True)
+    content = optimized[0]['content']
+
+    assert len(optimized) == 1
+    assert content.startswith(f'<div style="{FONT_STYLE}">\n')
+    assert content.endswith('</table>\n</div>\n' + PLAIN)
+    assert '<p class="MsoNormal"><b><span style="color:#0070C0;">標題</span></b></p>' in content
+    assert '<span><span style="font-family:Wingdings">l</span>項目</span>' in content
+    assert '<p class="MsoNormal">R0C0</p>' in content
+    assert content.count(FONT_STYLE) == 1
@@ -204,17 +204,32 @@ with st.container():
         uploaded_file = st.file_uploader("拖曳檔案至此或點擊上傳", type=['docx'])
 
 # --- Logic Section ---
+def get_uploader(post_id):
+    """跨 rerun 沿用同一個 uploader，保留預先登入的 session 與 Token"""
+    if st.session_state.get("uploader_post_id") != post_id:
+        st.session_state["uploader"] = WordUploader(post_id)
+        st.session_state["uploader_post_id"] = post_id
+    return st.session_state["uploader"]
+
 if uploaded_file and monthly_post_id:
     st.divider()
     
     # Initialize Uploader
-    uploader = WordUploader(monthly_post_id)
+    uploader = get_uploader(monthly_post_id)
+    # 解析與預覽的同時在背景登入並取得 Token
+    uploader.prefetch_session()
     
     # Process
     try:
-        sections = uploader.process_docx(uploaded_file) # Assuming this works with BytesIO based on previous edits
+        raw_sections = uploader.process_docx(uploaded_file) # Assuming this works with BytesIO based on previous edits
+        # 合併相鄰段落並精簡重複樣式，預覽與發布使用同一份結果
+        sections, stats = uploader.optimize_sections(raw_sections)
         
         st.markdown(f"### 03. 預覽與發布 (共 {len(sections)} 個段落)")
+        st.caption(
+            f"已合併 {stats['sections_before']} → {stats['sections_after']} 個段落，"
+            f"Payload {stats['bytes_before'] / 1024:.1f} KB → {stats['bytes_after'] / 1024:.1f} KB"
+        )
         
         # Preview Area
         for i, section in enumerate(sections):